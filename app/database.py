@@ -1,21 +1,27 @@
-import os
 from sqlalchemy import create_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
-from dotenv import load_dotenv
+from sqlalchemy.orm import scoped_session, sessionmaker
+from .settings import SETTINGS
 
-load_dotenv()
-
-DATABASE_URL = os.getenv("DATABASE_URL")
-
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+engine = create_engine(
+    SETTINGS.database_url,
+    # Keep pool_size at or above the worker's concurrency (-c) so greenlets never block on checkout.
+    pool_size=SETTINGS.db_pool_size,
+    max_overflow=SETTINGS.db_max_overflow,
+    pool_pre_ping=True,
+    pool_recycle=1800,
+    future=True,
+)
+# Thread-local session registry; each Celery worker thread (or eventlet greenlet) reuses its own session.
+SessionLocal = scoped_session(sessionmaker(autocommit=False, autoflush=False, bind=engine))
 Base = declarative_base()
 
 # Dependency to get a DB session for each request
 def get_db():
-    db = SessionLocal()
+    # Async handlers all run on the event loop thread, so hand out a fresh
+    # session from the factory instead of the shared thread-local one.
+    db = SessionLocal.session_factory()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
@@ -0,0 +1,23 @@
+import socket
+from functools import lru_cache
+
+_original_getaddrinfo = socket.getaddrinfo
+_cached_hosts = set()
+
+@lru_cache(maxsize=64)
+def _cached_getaddrinfo(host, port, family=0, type=0, proto=0, flags=0):
+    return _original_getaddrinfo(host, port, family, type, proto, flags)
+
+def _getaddrinfo(host, port, family=0, type=0, proto=0, flags=0):
+    if host in _cached_hosts:
+        return _cached_getaddrinfo(host, port, family, type, proto, flags)
+    return _original_getaddrinfo(host, port, family, type, proto, flags)
+
+def enable_dns_cache(host: str, port: int):
+    """
+    Caches socket.getaddrinfo results for `host` for the life of the process and resolves it once now.
+    Meant for prefork/threaded processes; eventlet workers already use dnspython's cooperative resolver.
+    """
+    _cached_hosts.add(host)
+    socket.getaddrinfo = _getaddrinfo
+    _getaddrinfo(host, port, 0, socket.SOCK_STREAM)
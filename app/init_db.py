@@ -0,0 +1,13 @@
+from . import models
+from .database import engine
+
+def init_db():
+    """
+    Creates the database tables if they don't exist.
+    Run once per deployment (start-api.sh does this) rather than on every import.
+    """
+    models.Base.metadata.create_all(bind=engine)
+
+if __name__ == "__main__":
+    init_db()
+    print("Database tables initialized.")
@@ -0,0 +1,33 @@
+import atexit
+import logging
+import os
+import queue
+from logging.handlers import QueueHandler, QueueListener
+from pythonjsonlogger.json import JsonFormatter
+
+_listener = None
+_listener_pid = None
+
+def setup_logging(level=logging.INFO):
+    """
+    Routes the `app` loggers through a QueueHandler so callers only pay for a queue put;
+    a background QueueListener formats records as JSON and writes them to stderr.
+    Safe to call again after a fork: the listener thread doesn't survive it, so a new one is started.
+    """
+    global _listener, _listener_pid
+    if _listener_pid == os.getpid():
+        return
+
+    log_queue = queue.SimpleQueue()
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(JsonFormatter("%(asctime)s %(levelname)s %(name)s %(message)s"))
+
+    app_logger = logging.getLogger("app")
+    app_logger.handlers = [QueueHandler(log_queue)]
+    app_logger.setLevel(level)
+    app_logger.propagate = False
+
+    _listener = QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+    _listener_pid = os.getpid()
+    atexit.register(_listener.stop)
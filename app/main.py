@@ -1,106 +1,236 @@
 import os
-import time
+import re
+import logging
+import asyncio
+import tempfile
+import glob
+from uuid import uuid4
+from urllib.parse import urlparse
 import boto3
 from contextlib import asynccontextmanager
+from functools import lru_cache
 from fastapi import FastAPI, UploadFile, File, Depends, HTTPException, Request
+from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 from botocore.exceptions import ClientError, NoCredentialsError
 from botocore.client import Config as BotocoreConfig
-from celery import Celery
-from dotenv import load_dotenv
+from boto3.s3.transfer import TransferConfig
+from celery import Celery, chain
+from celery.signals import worker_process_init
 
 # Import local modules
 from . import models, schemas
-from .database import SessionLocal, engine
+from .database import SessionLocal, get_db
+from .middleware import ContentSizeLimitMiddleware
+from .init_db import init_db
+from .dns_cache import enable_dns_cache
+from .logging_config import setup_logging
+from .settings import SETTINGS
 
 # Define a max file size in bytes (e.g., 200 MB)
 MAX_FILE_SIZE = 25 * 1024 * 1024
 
 # --- Initial Setup ---
-# Load environment variables from .env file
-load_dotenv()
+setup_logging()
+logger = logging.getLogger(__name__)
 
-# Create database tables if they don't exist
-models.Base.metadata.create_all(bind=engine)
+# Create database tables only when asked to; normally `python -m app.init_db` does this once
+# so every worker fork and reload doesn't re-run the schema introspection queries.
+if SETTINGS.run_db_init:
+    init_db()
 
 # --- App Configuration ---
-BUCKET_NAME = os.getenv('MINIO_BUCKET_NAME', 'documents')
+BUCKET_NAME = SETTINGS.minio_bucket_name
+# How long a presigned upload URL stays valid, in seconds.
+PRESIGNED_URL_EXPIRY = 900
+
+# Uploads below the threshold go out as a single PUT; larger ones use multipart.
+# The threshold matches the part size (and sits above MAX_FILE_SIZE), so an upload never
+# becomes a single-part multipart upload and anything within the limit is one PUT.
+UPLOAD_PART_SIZE = 32 * 1024 * 1024
+TRANSFER_CONFIG = TransferConfig(
+    multipart_threshold=max(UPLOAD_PART_SIZE, MAX_FILE_SIZE),
+    multipart_chunksize=UPLOAD_PART_SIZE,
+    max_concurrency=8,
+    use_threads=True,
+    io_chunksize=1024 * 1024,
+)
+
+# Downloads use ranged GETs in 16 MiB parts.
+DOWNLOAD_TRANSFER_CONFIG = TransferConfig(
+    multipart_threshold=16 * 1024 * 1024,
+    multipart_chunksize=16 * 1024 * 1024,
+    max_concurrency=8,
+    use_threads=True,
+    io_chunksize=1024 * 1024,
+)
+
+# Downloaded documents are written here so the CPU worker can read them; it must be shared by both workers.
+SCRATCH_DIR = SETTINGS.document_scratch_dir
+
+# Caps on the sanitized stem and extension keep object keys well under S3's 1024-byte limit.
+MAX_FILENAME_STEM_LENGTH = 200
+MAX_FILENAME_EXT_LENGTH = 16
+
+def secure_filename(filename: str) -> str:
+    """
+    Reduces a client-supplied filename to a safe object-key component
+    (no directories, only letters, digits, '.', '_' and '-').
+    The stem and extension are sanitized separately so the extension survives a non-ASCII stem.
+    """
+    name = os.path.basename(filename.replace('\\', '/'))
+    stem, ext = os.path.splitext(name)
+    stem = re.sub(r'[^A-Za-z0-9._-]+', '_', stem)[:MAX_FILENAME_STEM_LENGTH].strip('._') or 'file'
+    ext = re.sub(r'[^A-Za-z0-9]+', '', ext)[:MAX_FILENAME_EXT_LENGTH]
+    return f"{stem}.{ext}" if ext else stem
+
+def build_s3_key(filename: str) -> str:
+    # A random prefix keeps uploads with the same filename from overwriting each other.
+    return f"{uuid4().hex}/{secure_filename(filename)}"
+
+# Matches keys produced by build_s3_key; the filename part is already sanitized.
+S3_KEY_PATTERN = re.compile(r'[0-9a-f]{32}/(?P<filename>[A-Za-z0-9._-]+)')
 
 # --- Celery Configuration ---
 celery_app = Celery(
     __name__,
-    broker=os.getenv("CELERY_BROKER_URL"),
-    backend=os.getenv("CELERY_RESULT_BACKEND")
+    broker=SETTINGS.celery_broker_url,
+    backend=SETTINGS.celery_result_backend
 )
 celery_app.conf.update(
     task_track_started=True,
+    # Keep publisher connections pooled so .delay() doesn't reconnect to Redis each time.
+    broker_pool_limit=50,
+    broker_connection_retry_on_startup=True,
+    broker_transport_options={'visibility_timeout': 3600, 'socket_keepalive': True},
+    redis_socket_keepalive=True,
+    # Network-bound steps run on the eventlet 'io' workers, PDF parsing on the prefork 'cpu' workers.
+    task_default_queue='io',
+    # Ack only once a step has finished or failed, so a message lost before then is redelivered.
+    # A worker that dies mid-task (e.g. PyMuPDF crashing on a bad PDF) is not redelivered: the task
+    # fails with WorkerLostError and handle_pipeline_error marks the document FAILED.
+    task_acks_late=True,
+    task_acks_on_failure_or_timeout=True,
+    task_routes={
+        'fetch_document': {'queue': 'io'},
+        'extract_text': {'queue': 'cpu'},
+        'finalize_document': {'queue': 'io'},
+    },
 )
 
-# --- Database Dependency ---
-def get_db():
-    db = SessionLocal()
+# --- MinIO Client ---
+@lru_cache(maxsize=1)
+def get_s3_client():
+    """
+    Returns a process-wide boto3 S3 client for MinIO.
+    The client is built once so its connection pool is reused across requests and tasks.
+    """
+    return boto3.client(
+        's3',
+        endpoint_url=SETTINGS.minio_endpoint_url,
+        aws_access_key_id=SETTINGS.minio_root_user,
+        aws_secret_access_key=SETTINGS.minio_root_password,
+        config=BotocoreConfig(
+            s3={'addressing_style': 'path'},
+            signature_version='s3v4',
+            max_pool_connections=50,
+            tcp_keepalive=True,
+            retries={'mode': 'adaptive', 'max_attempts': 3},
+        )
+    )
+
+@lru_cache(maxsize=1)
+def get_presign_client():
+    """
+    Returns a boto3 S3 client pointed at the public MinIO endpoint, used only to presign URLs.
+    The host is part of the signature, so URLs handed to clients must be signed for the host they will call.
+    """
+    return boto3.client(
+        's3',
+        endpoint_url=SETTINGS.minio_public_endpoint_url,
+        aws_access_key_id=SETTINGS.minio_root_user,
+        aws_secret_access_key=SETTINGS.minio_root_password,
+        config=BotocoreConfig(s3={'addressing_style': 'path'}, signature_version='s3v4'),
+    )
+
+def enable_minio_dns_cache():
+    # Resolve the MinIO host once per process instead of on every new connection.
+    endpoint = urlparse(get_s3_client().meta.endpoint_url)
     try:
-        yield db
-    finally:
-        db.close()
+        enable_dns_cache(endpoint.hostname, endpoint.port)
+    except OSError as e:
+        logger.warning("Could not pre-resolve MinIO host '%s': %s", endpoint.hostname, e)
+
+@worker_process_init.connect
+def init_worker_s3_client(**kwargs):
+    # Each forked worker builds its own client; boto3 clients must not be shared across processes.
+    setup_logging()
+    get_s3_client.cache_clear()
+    get_s3_client()
+    enable_minio_dns_cache()
 
 # --- FastAPI Lifespan (for startup/shutdown events) ---
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    print("Application startup: Initializing MinIO connection...")
+    logger.info("Application startup: Initializing MinIO connection...")
     minio_client = None
     retries = 5
-    delay = 2
 
-    # Get cleaned environment variables
-    endpoint = os.getenv('MINIO_ENDPOINT', 'minio').strip()
-    user = os.getenv('MINIO_ROOT_USER', '').strip()
-    password = os.getenv('MINIO_ROOT_PASSWORD', '').strip()
-    
-    # Correctly build the endpoint URL
-    endpoint_url = f"http://{endpoint}:9000"
-    
-    print(f"Attempting to connect to MinIO at: {endpoint_url}")
+    s3 = get_s3_client()
+    logger.info("Attempting to connect to MinIO at: %s", s3.meta.endpoint_url)
+    await asyncio.to_thread(enable_minio_dns_cache)
 
     for i in range(retries):
+        # Exponential backoff (2s, 4s, 8s, ...), capped at 30s.
+        delay = min(30, 2 * 2 ** i)
         try:
-            minio_client = boto3.client(
-                's3',
-                endpoint_url=endpoint_url,
-                aws_access_key_id=user,
-                aws_secret_access_key=password,
-                config=BotocoreConfig(s3={'addressing_style': 'path'}, signature_version='s3v4')
-            )
-            
-            minio_client.head_bucket(Bucket=BUCKET_NAME)
-            print(f"✅ Successfully connected to MinIO. Bucket '{BUCKET_NAME}' found.")
+            await asyncio.to_thread(s3.head_bucket, Bucket=BUCKET_NAME)
+            logger.info("Successfully connected to MinIO. Bucket '%s' found.", BUCKET_NAME)
+            minio_client = s3
             break
         except ClientError as e:
             if e.response['Error']['Code'] == '404':
-                print(f"Bucket '{BUCKET_NAME}' not found. Creating it...")
-                minio_client.create_bucket(Bucket=BUCKET_NAME)
-                print(f"✅ Bucket '{BUCKET_NAME}' created. Connection successful.")
+                logger.info("Bucket '%s' not found. Creating it...", BUCKET_NAME)
+                await asyncio.to_thread(s3.create_bucket, Bucket=BUCKET_NAME)
+                logger.info("Bucket '%s' created. Connection successful.", BUCKET_NAME)
+                minio_client = s3
                 break
             else:
-                print(f"Attempt {i + 1}/{retries} failed with a ClientError: {e}. Retrying in {delay}s...")
-                time.sleep(delay)
+                logger.warning("Attempt %d/%d failed with a ClientError: %s. Retrying in %ss...", i + 1, retries, e, delay)
         except Exception as e:
-            print(f"Attempt {i + 1}/{retries} failed to connect to MinIO: {e}. Retrying in {delay}s...")
-            time.sleep(delay)
-    
+            logger.warning("Attempt %d/%d failed to connect to MinIO: %s. Retrying in %ss...", i + 1, retries, e, delay)
+        if i + 1 < retries:
+            await asyncio.sleep(delay)
+
     if minio_client is None:
         raise RuntimeError("Could not connect to MinIO after several retries.")
 
+    # Open one broker connection up front so the first upload doesn't pay for the connect.
+    # Best-effort only: the API can start without Redis and connects lazily on first enqueue.
+    def warm_broker_pool():
+        with celery_app.pool.acquire(block=True) as conn:
+            conn.ensure_connection(max_retries=3)
+
+    try:
+        await asyncio.to_thread(warm_broker_pool)
+        logger.info("Broker connection pool warmed up.")
+    except Exception as e:
+        logger.warning("Could not pre-warm the broker connection pool: %s. Continuing startup.", e)
+
     yield # The application runs here
 
-    print("Application shutdown.")
+    logger.info("Application shutdown.")
 
 # --- FastAPI App Initialization ---
 app = FastAPI(title="Document Upload Service", lifespan=lifespan)
+# Reject oversize bodies at the ASGI layer, before they are spooled into an UploadFile.
+app.add_middleware(ContentSizeLimitMiddleware, max_content_size=MAX_FILE_SIZE)
 
 # --- API Endpoints ---
 @app.post("/upload/", response_model=schemas.Document)
 async def upload_document(
+    request: Request,
     file: UploadFile = File(...),
     db: Session = Depends(get_db)
 ):
@@ -109,13 +239,16 @@ async def upload_document(
     and queues a processing task.
     """
     # === NEW: File Size Check ===
-    # To get the file size, we need to read the content length from the header.
-    # This is more reliable than file.size which may not be available for streams.
+    # ContentSizeLimitMiddleware already rejects oversize bodies before they are buffered;
+    # this keeps the endpoint's contract explicit when it is mounted without the middleware.
     content_length = request.headers.get('content-length')
     if not content_length:
         raise HTTPException(status_code=411, detail="Content-Length header required.")
     
-    file_size = int(content_length)
+    try:
+        file_size = int(content_length)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid Content-Length header.")
     if file_size > MAX_FILE_SIZE:
         raise HTTPException(
             status_code=413, # 413 Payload Too Large
@@ -123,23 +256,15 @@ async def upload_document(
         )
     # ============================
 
-    endpoint = os.getenv('MINIO_ENDPOINT', 'minio').strip()
-    user = os.getenv('MINIO_ROOT_USER', '').strip()
-    password = os.getenv('MINIO_ROOT_PASSWORD', '').strip()
-    endpoint_url = f"http://{endpoint}:9000"
-
-    minio_client = boto3.client(
-        's3',
-        endpoint_url=endpoint_url,
-        aws_access_key_id=user,
-        aws_secret_access_key=password,
-        config=BotocoreConfig(s3={'addressing_style': 'path'}, signature_version='s3v4')
-    )
-    s3_key = file.filename
+    minio_client = get_s3_client()
+    s3_key = build_s3_key(file.filename)
 
     try:
-        minio_client.upload_fileobj(file.file, BUCKET_NAME, s3_key)
-        print(f"Successfully uploaded '{file.filename}' to MinIO.")
+        # boto3 is synchronous; run the transfer in a thread so the event loop keeps serving requests.
+        await asyncio.to_thread(
+            minio_client.upload_fileobj, file.file, BUCKET_NAME, s3_key, Config=TRANSFER_CONFIG
+        )
+        logger.info("Successfully uploaded '%s' to MinIO.", file.filename)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"An unexpected error occurred during upload: {e}")
 
@@ -148,8 +273,70 @@ async def upload_document(
     db.commit()
     db.refresh(db_document)
 
-    process_document.delay(db_document.id)
-    print(f"Queued task for '{file.filename}' in Redis.")
+    await asyncio.to_thread(process_document, db_document.id)
+    logger.info("Queued task for '%s' in Redis.", file.filename)
+    return db_document
+
+@app.post("/upload-url/", response_model=schemas.UploadURL)
+def create_upload_url(upload: schemas.UploadURLRequest):
+    """
+    Returns a presigned URL the client can PUT the file to directly in MinIO,
+    so the file bytes never pass through this service.
+    """
+    s3_key = build_s3_key(upload.filename)
+    filename = S3_KEY_PATTERN.fullmatch(s3_key).group('filename')
+    url = get_presign_client().generate_presigned_url(
+        'put_object',
+        Params={'Bucket': BUCKET_NAME, 'Key': s3_key},
+        ExpiresIn=PRESIGNED_URL_EXPIRY,
+    )
+    return {"url": url, "key": s3_key, "filename": filename}
+
+@app.post("/finalize/{key:path}", response_model=schemas.Document)
+def finalize_upload(key: str, db: Session = Depends(get_db)):
+    """
+    Registers a file the client uploaded through a presigned URL
+    and queues a processing task for it. The filename is taken from the key.
+    """
+    match = S3_KEY_PATTERN.fullmatch(key)
+    if match is None:
+        raise HTTPException(status_code=400, detail="Invalid upload key")
+    filename = match.group('filename')
+
+    already_registered = db.execute(
+        select(models.Document.id).where(models.Document.s3_path == key)
+    ).first()
+    if already_registered:
+        raise HTTPException(status_code=409, detail="Upload already finalized")
+
+    minio_client = get_s3_client()
+    try:
+        head = minio_client.head_object(Bucket=BUCKET_NAME, Key=key)
+    except ClientError as e:
+        if e.response['Error']['Code'] == '404':
+            raise HTTPException(status_code=404, detail="Uploaded file not found")
+        raise HTTPException(status_code=500, detail=f"An unexpected error occurred during finalize: {e}")
+
+    # A presigned PUT can't cap the body size, so enforce the limit here instead.
+    if head['ContentLength'] > MAX_FILE_SIZE:
+        minio_client.delete_object(Bucket=BUCKET_NAME, Key=key)
+        raise HTTPException(
+            status_code=413,
+            detail=f"File is too large. Limit is {MAX_FILE_SIZE / 1024 / 1024} MB."
+        )
+
+    db_document = models.Document(filename=filename, s3_path=key)
+    db.add(db_document)
+    try:
+        db.commit()
+    except IntegrityError:
+        # Lost a race with a concurrent finalize for the same key.
+        db.rollback()
+        raise HTTPException(status_code=409, detail="Upload already finalized")
+    db.refresh(db_document)
+
+    process_document(db_document.id)
+    logger.info("Queued task for '%s' in Redis.", filename)
     return db_document
 
 @app.get("/status/{document_id}", response_model=schemas.Document)
@@ -167,57 +354,177 @@ def read_root():
     return {"message": "Welcome to the Document Processing API"}
 
 # --- Celery Task ---
-@celery_app.task(name="process_document")
+def _set_document_status(document_id: int, status: models.DocumentStatus):
+    """
+    Builds a bulk UPDATE of a document's status that bypasses the ORM identity map.
+    """
+    return (
+        update(models.Document)
+        .where(models.Document.id == document_id)
+        .values(status=status)
+        .execution_options(synchronize_session=False)
+    )
+
+def _mark_document_failed(document_id: int):
+    db = SessionLocal()
+    try:
+        db.execute(_set_document_status(document_id, models.DocumentStatus.FAILED))
+        db.commit()
+    finally:
+        SessionLocal.remove()
+
+def _remove_scratch_file(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
 def process_document(document_id: int):
     """
-    Celery task to process a document with robust database handling.
+    Queues the processing pipeline for a document: fetch (io) -> extract text (cpu) -> finalize (io).
+    """
+    return chain(
+        fetch_document.s(document_id),
+        extract_text.s(),
+        finalize_document.s(),
+    ).on_error(handle_pipeline_error.s(document_id)).delay()
+
+@celery_app.task(name="handle_pipeline_error")
+def handle_pipeline_error(request, exc, traceback, document_id: int):
+    """
+    Error callback for the processing chain: runs when a step raises instead of
+    handling its own failure, and marks the document FAILED and removes its scratch files.
+    """
+    logger.error("Pipeline step %s failed for document %s. Error: %s", request.task, document_id, exc)
+    for path in glob.glob(os.path.join(SCRATCH_DIR, f"doc-{document_id}-*")):
+        _remove_scratch_file(path)
+    _mark_document_failed(document_id)
+
+@celery_app.task(name="fetch_document")
+def fetch_document(document_id: int):
+    """
+    Celery task that marks a document as processing and downloads it to the scratch directory.
+    Returns None when there is nothing left to do, which the later steps pass through.
     """
     db = SessionLocal()
     doc = None
+    path = None
     try:
-        doc = db.query(models.Document).filter(models.Document.id == document_id).first()
-        if not doc:
-            print(f"Document with ID {document_id} not found.")
-            return
+        minio_client = get_s3_client()
 
-        doc.status = models.DocumentStatus.PROCESSING
+        # Mark the row as processing and fetch what the task needs in one round-trip.
+        # Already-processed rows are left untouched so a retry can be checked against the stored ETag.
+        doc = db.execute(
+            _set_document_status(document_id, models.DocumentStatus.PROCESSING)
+            .where(models.Document.status != models.DocumentStatus.PROCESSED)
+            .returning(models.Document.filename, models.Document.s3_path)
+        ).first()
+        # Commit before any MinIO round-trip so the row lock and pooled connection aren't held over it.
         db.commit()
-        print(f"Processing document: {doc.filename} (ID: {doc.id})")
-
-        endpoint = os.getenv('MINIO_ENDPOINT', 'minio').strip()
-        user = os.getenv('MINIO_ROOT_USER', '').strip()
-        password = os.getenv('MINIO_ROOT_PASSWORD', '').strip()
-        endpoint_url = f"http://{endpoint}:9000"
-
-        minio_client = boto3.client(
-            's3',
-            endpoint_url=endpoint_url,
-            aws_access_key_id=user,
-            aws_secret_access_key=password,
-            config=BotocoreConfig(s3={'addressing_style': 'path'}, signature_version='s3v4')
-        )
-        
-        response = minio_client.get_object(Bucket=BUCKET_NAME, Key=doc.filename)
-        file_content = response['Body'].read()
+        if doc:
+            head = minio_client.head_object(Bucket=BUCKET_NAME, Key=doc.s3_path)
+        else:
+            doc = db.execute(
+                select(models.Document.filename, models.Document.s3_path, models.Document.etag)
+                .where(models.Document.id == document_id)
+            ).first()
+            db.commit()
+            if not doc:
+                logger.warning("Document with ID %s not found.", document_id)
+                return None
+
+            head = minio_client.head_object(Bucket=BUCKET_NAME, Key=doc.s3_path)
+            if head['ETag'] == doc.etag:
+                logger.info("Document %s (ID: %s) is unchanged since it was processed. Skipping.", doc.filename, document_id)
+                return None
+            db.execute(_set_document_status(document_id, models.DocumentStatus.PROCESSING))
+            db.commit()
+        logger.info("Processing document: %s (ID: %s)", doc.filename, document_id)
+
+        # A presigned PUT URL stays valid after finalize, so the object may have been replaced
+        # with something larger; re-check the limit before downloading it.
+        if head['ContentLength'] > MAX_FILE_SIZE:
+            raise ValueError(
+                f"Object is {head['ContentLength']} bytes; limit is {MAX_FILE_SIZE} bytes."
+            )
+
+        with tempfile.NamedTemporaryFile(dir=SCRATCH_DIR, prefix=f"doc-{document_id}-", delete=False) as scratch:
+            path = scratch.name
+            minio_client.download_fileobj(
+                BUCKET_NAME, doc.s3_path, scratch, Config=DOWNLOAD_TRANSFER_CONFIG
+            )
+
+        return {
+            "document_id": document_id,
+            "filename": doc.filename,
+            "path": path,
+            "etag": head['ETag'],
+        }
+    except Exception as e:
+        logger.error("Failed to fetch document %s. Error: %s", document_id, e)
+        db.rollback()
+        if path:
+            _remove_scratch_file(path)
+        if doc:
+            _mark_document_failed(document_id)
+        return None
+    finally:
+        SessionLocal.remove()
+
+# Hard limit so a parse that hangs is killed and reported to handle_pipeline_error.
+EXTRACT_TIME_LIMIT = 300
+
+@celery_app.task(name="extract_text", time_limit=EXTRACT_TIME_LIMIT)
+def extract_text(fetched):
+    """
+    Celery task for the CPU-bound part of processing.
+    It only touches the database to mark the document FAILED if extraction fails.
+    """
+    if fetched is None:
+        return None
+
+    document_id = fetched["document_id"]
+    filename = fetched["filename"]
+    try:
+        file_size = os.path.getsize(fetched["path"])
 
         # --- YOUR ACTUAL DOCUMENT PROCESSING LOGIC WOULD GO HERE ---
         # For example, using PyMuPDF (fitz) to extract text from a PDF:
-        # if doc.filename.lower().endswith('.pdf'):
-        #     with fitz.open(stream=file_content, filetype="pdf") as pdf_doc:
+        # if filename.lower().endswith('.pdf'):
+        #     with fitz.open(fetched["path"]) as pdf_doc:
         #         text = "".join(page.get_text() for page in pdf_doc)
-        #     print(f"Extracted {len(text)} characters from PDF.")
+        #     logger.info("Extracted %d characters from PDF.", len(text))
 
-        print(f"--- Extracted content from {doc.filename}, {len(file_content)} bytes ---")
+        logger.info("Extracted content from %s, %d bytes", filename, file_size)
+        return fetched
+    except Exception as e:
+        logger.error("Failed to process document %s. Error: %s", document_id, e)
+        _remove_scratch_file(fetched["path"])
+        _mark_document_failed(document_id)
+        return None
+
+@celery_app.task(name="finalize_document")
+def finalize_document(extracted):
+    """
+    Celery task that records a successfully processed document and cleans up its scratch file.
+    """
+    if extracted is None:
+        return
 
-        doc.status = models.DocumentStatus.PROCESSED
-        print(f"Finished processing document: {doc.filename}")
+    document_id = extracted["document_id"]
+    _remove_scratch_file(extracted["path"])
+    db = SessionLocal()
+    try:
+        db.execute(
+            _set_document_status(document_id, models.DocumentStatus.PROCESSED)
+            .values(etag=extracted["etag"])
+        )
+        db.commit()
+        logger.info("Finished processing document: %s", extracted['filename'])
     except Exception as e:
-        print(f"Failed to process document {document_id}. Error: {e}")
+        logger.error("Failed to finalize document %s. Error: %s", document_id, e)
         db.rollback()
-        if doc:
-            doc.status = models.DocumentStatus.FAILED
+        _mark_document_failed(document_id)
     finally:
-        if db.is_active:
-            db.commit()
-        db.close()
-        print(f"Database session closed for document {document_id}.")
+        SessionLocal.remove()
+        logger.debug("Database session closed for document %s.", document_id)
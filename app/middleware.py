@@ -0,0 +1,49 @@
+from fastapi import HTTPException
+from starlette.responses import JSONResponse
+
+class ContentSizeLimitMiddleware:
+    """
+    ASGI middleware that rejects request bodies larger than `max_content_size`
+    before FastAPI buffers them into an UploadFile.
+    """
+
+    def __init__(self, app, max_content_size: int):
+        self.app = app
+        self.max_content_size = max_content_size
+
+    def _too_large_detail(self):
+        return f"File is too large. Limit is {self.max_content_size / 1024 / 1024} MB."
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        # Fast path: reject on the declared size without reading any of the body.
+        headers = dict(scope["headers"])
+        content_length = headers.get(b"content-length")
+        if content_length is not None:
+            try:
+                declared_size = int(content_length)
+            except ValueError:
+                response = JSONResponse(status_code=400, content={"detail": "Invalid Content-Length header."})
+                await response(scope, receive, send)
+                return
+            if declared_size > self.max_content_size:
+                response = JSONResponse(status_code=413, content={"detail": self._too_large_detail()})
+                await response(scope, receive, send)
+                return
+
+        # Chunked or lying clients: count bytes as they arrive and stop once over the limit.
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_content_size:
+                    raise HTTPException(status_code=413, detail=self._too_large_detail())
+            return message
+
+        await self.app(scope, limited_receive, send)
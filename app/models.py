@@ -1,5 +1,6 @@
 import enum
-from sqlalchemy import Column, Integer, String, DateTime, Enum as SQLEnum
+from sqlalchemy import Column, Integer, SmallInteger, String, DateTime, Index
+from sqlalchemy.types import TypeDecorator
 from sqlalchemy.sql import func
 from .database import Base
 
@@ -9,11 +10,45 @@ class DocumentStatus(enum.Enum):
     PROCESSED = "processed"
     FAILED = "failed"
 
+# Stored codes; append new statuses, never renumber existing ones.
+STATUS_TO_INT = {
+    DocumentStatus.QUEUED: 0,
+    DocumentStatus.PROCESSING: 1,
+    DocumentStatus.PROCESSED: 2,
+    DocumentStatus.FAILED: 3,
+}
+INT_TO_STATUS = {code: status for status, code in STATUS_TO_INT.items()}
+
+class DocumentStatusType(TypeDecorator):
+    """
+    Stores a DocumentStatus as a SMALLINT instead of a database ENUM.
+    """
+    impl = SmallInteger
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        return STATUS_TO_INT[value]
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        return INT_TO_STATUS[value]
+
 class Document(Base):
     __tablename__ = "documents"
+    __table_args__ = (
+        # Supports "oldest queued/failed documents first" scans without a sort step; with status
+        # as the leading column it also serves plain status lookups, so status has no index of its own.
+        Index('ix_docs_status_upload', 'status', 'upload_time'),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
-    filename = Column(String, index=True)
-    s3_path = Column(String)
+    filename = Column(String)
+    # Unique so a presigned upload can only be finalized once.
+    s3_path = Column(String, unique=True)
+    # ETag of the object version that was last processed successfully.
+    etag = Column(String)
     upload_time = Column(DateTime(timezone=True), server_default=func.now())
-    status = Column(SQLEnum(DocumentStatus), default=DocumentStatus.QUEUED)
\ No newline at end of file
+    status = Column(DocumentStatusType(), default=DocumentStatus.QUEUED)
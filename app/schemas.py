@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 from datetime import datetime
 from .models import DocumentStatus
 
@@ -10,6 +10,15 @@ class DocumentBase(BaseModel):
 class DocumentCreate(DocumentBase):
     s3_path: str
 
+# Schema for requesting a presigned upload URL
+class UploadURLRequest(DocumentBase):
+    pass
+
+# Schema for a presigned upload URL (API response)
+class UploadURL(DocumentBase):
+    url: str
+    key: str
+
 # Schema for reading a document (API response)
 class Document(DocumentBase):
     id: int
@@ -17,5 +26,4 @@ class Document(DocumentBase):
     upload_time: datetime
     status: DocumentStatus
 
-    class Config:
-        orm_mode = True # Allows Pydantic to read data from ORM objects
\ No newline at end of file
+    model_config = ConfigDict(from_attributes=True) # Allows Pydantic to read data from ORM objects
\ No newline at end of file
@@ -0,0 +1,45 @@
+import tempfile
+from functools import lru_cache
+from typing import Optional
+from pydantic_settings import BaseSettings, SettingsConfigDict
+
+class Settings(BaseSettings):
+    """
+    Application configuration, read once from the environment (and .env).
+    Field names map to upper-case environment variables, e.g. `minio_endpoint` -> MINIO_ENDPOINT.
+    """
+    model_config = SettingsConfigDict(env_file=".env", extra="ignore", str_strip_whitespace=True)
+
+    # Database
+    database_url: str
+    db_pool_size: int = 20
+    db_max_overflow: int = 40
+    run_db_init: bool = False
+
+    # Celery
+    celery_broker_url: Optional[str] = None
+    celery_result_backend: Optional[str] = None
+    document_scratch_dir: str = tempfile.gettempdir()
+
+    # MinIO
+    minio_endpoint: str = "minio"
+    minio_root_user: str
+    minio_root_password: str
+    minio_bucket_name: str = "documents"
+    # Base URL clients outside the compose network use to reach MinIO, e.g. http://localhost:9000.
+    # Presigned URLs are signed for this host; defaults to the internal endpoint.
+    minio_public_endpoint: Optional[str] = None
+
+    @property
+    def minio_endpoint_url(self) -> str:
+        return f"http://{self.minio_endpoint}:9000"
+
+    @property
+    def minio_public_endpoint_url(self) -> str:
+        return self.minio_public_endpoint or self.minio_endpoint_url
+
+@lru_cache
+def get_settings() -> Settings:
+    return Settings()
+
+SETTINGS = get_settings()
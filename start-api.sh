@@ -10,6 +10,9 @@ set -e
 echo "--> MinIO is ready. Giving the service 5 seconds to initialize..."
 sleep 5
 
+echo "--> Initializing database tables..."
+python -m app.init_db
+
 echo "--> Starting FastAPI server..."
 # Execute the final command, replacing this shell process.
 exec uvicorn app.main:app --host 0.0.0.0 --port 3000
\ No newline at end of file